@@ -2,6 +2,8 @@
 
 from rich import print
 from rich.console import Console
+from rich.pretty import Pretty
+from contextlib import ExitStack
 from traceback import print_exception
 import argparse
 import random
@@ -12,10 +14,43 @@ from systeme.instruction import Sleep, Assign, Add, Sub, Mul
 from systeme.system import System, Sequential, Parallelize
 from systeme.variable import Variable
 
+def scenario_1():
+    t1 = Task([
+        Assign('x', 30),
+        Sleep(1)
+    ])
+    t2 = Task([
+        Assign('y', 10),
+        Sleep(1)
+    ], dependencies=t1)
+    t3 = Task([
+        Assign('z', 10),
+        Sleep(1)
+    ], dependencies=[t1])
+    t4 = Task([
+        Add(10, 40, 'z'),
+        Sleep(1)
+    ], dependencies=[t2, t3])
+    t5 = Task([
+        Assign('o', 100),
+        Sleep(1)
+    ], dependencies=[t3])
+    t6 = Task([
+        Assign('o', 1000),
+    ], dependencies=[t4, t5])
+    return [t1, t2, t3, t4, t5, t6]
+
+# Functions creating the tasks of the system
+SCENARIOS = {
+    '1': scenario_1,
+}
+
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument('--seed', '-s', type=int, default=int(time.time()), help='Set the seed for random. Default is the seconds elapsed since the EPOCH.')
 
+    parser.add_argument('--scenario', choices=SCENARIOS.keys(), default='1', help='Choose the tasks of the system.')
+
     parser.add_argument('--loops', type=int, default=1, help='Repeat the execution of the system(s).')
 
     parser.add_argument('--test', '-t', action='store_true', help='Create multiple parallelized systems.')
@@ -25,6 +60,7 @@ def parse_args():
     parser.add_argument('--parallelize', '-p', action='store_true', help='Run the system as parallelized.')
 
     parser.add_argument('--view', '-v', action='store_true', help='View generated graphs.')
+    parser.add_argument('--virtual-time', action='store_true', help='Do not block while sleeping, only advance a virtual clock.')
 
     parser.add_argument('--debug', '-d', action='store_true', help='Show full exception when it occurs.')
     args = parser.parse_args()
@@ -35,79 +71,63 @@ def parse_args():
 
 def main():
     args = parse_args()
-    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    Sleep.virtual = args.virtual_time
 
     console = Console()
+    # Printed all at once at the end, strings as well as renderables
+    results = []
+    # The threads of every created system are shut down at the end
+    systems = ExitStack()
 
     try:
-        t1 = Task([
-            Assign('x', 30),
-            Sleep(1)
-        ])
-        t2 = Task([
-            Assign('y', 10),
-            Sleep(1)
-        ], dependencies=t1)
-        t3 = Task([
-            Assign('z', 10),
-            Sleep(1)
-        ], dependencies=[t1])
-        t4 = Task([
-            Add(10, 40, 'z'),
-            Sleep(1)
-        ], dependencies=[t2, t3])
-        t5 = Task([
-            Assign('o', 100),
-            Sleep(1)
-        ], dependencies=[t3])
-        t6 = Task([
-            Assign('o', 1000),
-        ], dependencies=[t4, t5])
-
-        system = System(tasks=Task.get_all_tasks())
+        system = systems.enter_context(System(tasks=SCENARIOS[args.scenario]()))
         if args.randomize:
-            system.randomize_variables()
-        system.draw(view=args.view)
+            system.randomize_variables(rng=rng, verbose=True)
+        if args.view:
+            system.draw(view=True)
 
         if args.test:
             console.rule('Test')
-            parallel = Parallelize(system)
+            parallel = systems.enter_context(Parallelize(system))
             parallel.run(loops=10, verbose=False)
             if not parallel.are_histories_equal():
-                print('The test is [red bold]invalid[/red bold].')
-                print('Histories :')
-                pprint(parallel.histories)
+                results.append('The test is [red bold]invalid[/red bold].')
+                results.append('Histories :')
+                results.append(Pretty(parallel.histories))
             else:
-                print('The test is [green bold]valid[/green bold].')
+                results.append('The test is [green bold]valid[/green bold].')
 
         if args.parallelize:
-            parallel = Parallelize(system)
-            parallel.draw(view=args.view)
+            parallel = systems.enter_context(Parallelize(system))
+            if args.view:
+                parallel.draw(view=True)
 
         if args.sequential:
-            sequential = Sequential(system)
-            sequential.draw(view=args.view)
+            sequential = systems.enter_context(Sequential(system))
+            if args.view:
+                sequential.draw(view=True)
 
         system.run(loops=args.loops)
         if args.parallelize:
             parallel.run(loops=args.loops)
             if system.is_equivalent(parallel):
-                print('The system and the parallelized one are [green bold]equivalent[/green bold].')
+                results.append('The system and the parallelized one are [green bold]equivalent[/green bold].')
             else:
-                print('The system and the parallelized one are [red bold]not equivalent[/red bold].')
+                results.append('The system and the parallelized one are [red bold]not equivalent[/red bold].')
 
         if args.sequential:
             sequential.run(loops=args.loops)
             if system.is_equivalent(sequential):
-                print('The system and the sequential one are [green bold]equivalent[/green bold].')
+                results.append('The system and the sequential one are [green bold]equivalent[/green bold].')
             else:
-                print('The system and the sequential one are [red bold]not equivalent[/red bold].')
+                results.append('The system and the sequential one are [red bold]not equivalent[/red bold].')
 
         if args.sequential and args.parallelize:
             if parallel.is_equivalent(sequential):
-                print('The parallelized and the sequential systems are [green bold]equivalent[/green bold].')
+                results.append('The parallelized and the sequential systems are [green bold]equivalent[/green bold].')
             else:
-                print('The parallelized and the sequential systems are [red bold]not equivalent[/red bold].')
+                results.append('The parallelized and the sequential systems are [red bold]not equivalent[/red bold].')
 
     except (RuntimeError, ValueError) as e:
         if args.debug:
@@ -115,7 +135,14 @@ def main():
         print('[red]ERROR: [bold]{}[/bold][/red] '.format(e))
     except KeyboardInterrupt:
         pass
-    
+    finally:
+        systems.close()
+
+    if results:
+        console.rule('Results')
+        for result in results:
+            console.print(result)
+
     console.rule('Parameters')
     print('Seed : {}'.format(args.seed))
 
@@ -1,9 +1,195 @@
 from typing import *
 import operator
+import threading
 import time
 
 from systeme.variable import Variable
 
+# Symbols used to represent the operations.
+_OP_SYMBOL = {
+    operator.add: '+',
+    operator.sub: '-',
+    operator.floordiv: '/',
+    operator.mul: '*',
+}
+
+# Python operators used in the generated source code.
+_OP_SOURCE = {
+    operator.add: '+',
+    operator.sub: '-',
+    operator.floordiv: '//',
+    operator.mul: '*',
+}
+
+# Bound of the magnitude of the result of an operation, from the bounds of its operands, see SourceGenerator.bound.
+_OP_BOUND = {
+    operator.add: operator.add,
+    operator.sub: operator.add,
+    # |a // b| <= |a| whenever b != 0
+    operator.floordiv: lambda a, b: a,
+    operator.mul: operator.mul,
+}
+
+def _literal(expression:str) -> Optional[int]:
+    """Get the value of an expression if it is an integer literal, None otherwise."""
+    try:
+        return int(expression)
+    except ValueError:
+        return None
+
+class SourceGenerator:
+    """Generate the source code of a straight-line function executing instructions, see Instruction.emit_source().
+
+    Each write is stored in a new local (w0, w1, ...) and the variables read before being written are the arguments (v0, v1, ...).
+    The functions called by the generated code (see call()) are made available in its globals.
+
+    The constants are propagated and folded while generating :
+    reading a variable which has been affected a constant gives the constant itself,
+    and an operation between two constants gives its result.
+    As the constants may change (see System.randomize_variables()), the code has to be generated again afterwards.
+    The generated function returns the written values in order, so that they can be affected afterwards
+    to the variables, keeping their histories intact :
+
+        def execute(v0):
+            w0 = 10
+            w1 = (v0 + w0)
+            return (w0, w1)
+
+    The magnitude of every value is bounded along the way (see bound),
+    so that the function can be known to fit in fixed-size integers, like the int64 of Numba.
+    """
+    # The magnitude assumed for the values of the inputs when bounding the other values
+    INPUT_BOUND = 2 ** 31
+
+    def __init__(self):
+        self.lines = []
+        self.inputs = []
+        self.writes = []
+        self.names = {}
+        self.globals = {}
+        # Bound of the magnitude of each local and operation
+        self.bounds = {}
+        # The largest magnitude any value of the function may reach, for inputs within INPUT_BOUND
+        self.bound = 0
+
+    def _bound(self, expression:str) -> int:
+        """Get the bound of the magnitude of an expression.
+
+        Args:
+            expression (str): A literal, a local or an operation generated before.
+
+        Returns:
+            int: The bound.
+        """
+        value = _literal(expression)
+        if value is not None:
+            return abs(value)
+        return self.bounds[expression]
+
+    def read(self, variable:Variable) -> str:
+        """Get the local holding the current value of a variable.
+
+        Args:
+            variable (Variable): The variable to read.
+
+        Returns:
+            str: The name of the local.
+        """
+        if variable not in self.names:
+            self.names[variable] = 'v{}'.format(len(self.inputs))
+            self.bounds[self.names[variable]] = self.__class__.INPUT_BOUND
+            self.inputs.append(variable)
+        return self.names[variable]
+
+    def write(self, variable:Variable, expression:str) -> str:
+        """Store an expression in a new local, standing for the new value of the variable.
+
+        Args:
+            variable (Variable): The written variable.
+            expression (str): The expression of the value.
+
+        Returns:
+            str: The name of the local.
+        """
+        name = 'w{}'.format(len(self.writes))
+        self.lines.append('{} = {}'.format(name, expression))
+        self.writes.append(variable)
+        self.bounds[name] = self._bound(expression)
+        self.bound = max(self.bound, self.bounds[name])
+        # Propagate the constant to the following reads
+        self.names[variable] = expression if _literal(expression) is not None else name
+        return self.names[variable]
+
+    def operation(self, operation:Callable[[int, int], int], a:str, b:str) -> str:
+        """Get the expression of an operation, folded when both operands are constants.
+
+        Args:
+            operation (Callable[[int, int], int]): The operation.
+            a (str): The expression of the first operand.
+            b (str): The expression of the second operand.
+
+        Returns:
+            str: The expression of the result.
+        """
+        x = _literal(a)
+        y = _literal(b)
+        # A division by zero is left to be raised when executed
+        if x is not None and y is not None and not (operation == operator.floordiv and y == 0):
+            return repr(operation(x, y))
+
+        expression = '({} {} {})'.format(a, _OP_SOURCE[operation], b)
+        self.bounds[expression] = _OP_BOUND[operation](self._bound(a), self._bound(b))
+        self.bound = max(self.bound, self._bound(a), self._bound(b), self.bounds[expression])
+        return expression
+
+    def evaluate(self, expression:str):
+        """Append the expression of a top-level instruction, which value is not stored.
+        An operation is still computed, so that a division by zero raises as when executed.
+
+        Args:
+            expression (str): The expression returned by Instruction.emit_source().
+        """
+        # Only the operations are parenthesized, the literals and locals have no effect
+        if expression.startswith('('):
+            self.lines.append(expression)
+
+    def call(self, function:Callable, *arguments:Any):
+        """Append a call to a function, which result is not used.
+
+        Args:
+            function (Callable): The function, available in the globals of the generated code under its name.
+            arguments (Any): The arguments, represented with repr().
+        """
+        self.globals[function.__name__] = function
+        self.lines.append('{}({})'.format(function.__name__, ', '.join(repr(argument) for argument in arguments)))
+
+    def generate(self, name:str='execute') -> str:
+        """Generate the source code of the function.
+
+        Args:
+            name (str, optional): The name of the function. Defaults to 'execute'.
+
+        Returns:
+            str: The source code.
+        """
+        arguments = ', '.join('v{}'.format(i) for i in range(len(self.inputs)))
+        results = ''.join('w{}, '.format(i) for i in range(len(self.writes)))
+        body = ''.join('    {}\n'.format(line) for line in self.lines)
+        return 'def {}({}):\n{}    return ({})\n'.format(name, arguments, body, results)
+
+    def build(self, name:str='execute') -> Callable[..., Tuple[int, ...]]:
+        """Generate then compile the function.
+
+        Args:
+            name (str, optional): The name of the function. Defaults to 'execute'.
+
+        Returns:
+            Callable[..., Tuple[int, ...]]: The function, taking the values of the inputs and returning the written values.
+        """
+        namespace = dict(self.globals)
+        exec(compile(self.generate(name), '<{}>'.format(name), 'exec'), namespace)
+        return namespace[name]
+
 class Instruction:
     """A prototype class used to forge simple instructions like +, -, *, /, = (assigning).
     
@@ -15,6 +201,9 @@ class Instruction:
         - int => Constant(x)
         - Variable => Read(x)
     """
+    # No __dict__ for instructions, as there may be a lot of them
+    __slots__ = ('_str',)
+    _str: str
 
     def __init__(self, *args, **kwargs):
         """Every arguments such as instances of Variable, etc...
@@ -35,35 +224,146 @@ class Instruction:
         """
         raise NotImplementedError()
 
+    def compile(self) -> Callable[[], Optional[int]]:
+        """Compile the instruction into a closure capturing directly
+        the operation, the nested closures and the variables.
+
+        The tree is walked only once here,
+        instead of on every execution.
+
+        Raises:
+            NotImplementedError: Shall be overwritten.
+
+        Returns:
+            Callable[[], Optional[int]]: A function without any argument, returning the same value as execute().
+        """
+        raise NotImplementedError()
+
+    def emit_source(self, generator:SourceGenerator) -> str:
+        """Emit the source code of the instruction, see SourceGenerator.
+
+        Args:
+            generator (SourceGenerator): The generator in which the statements are appended.
+
+        Raises:
+            NotImplementedError: Shall be overwritten, if the instruction can be expressed as source code.
+
+        Returns:
+            str: An expression of the value of the instruction.
+        """
+        raise NotImplementedError()
+
+    def collect_domains(self, read_domain:Set[Variable], write_domain:Set[Variable], nested:bool=False):
+        """Add the variables read and written by the instruction, and its nested ones, to the domains (see Task).
+        Nothing is read nor written by default.
+
+        Args:
+            read_domain (Set[Variable]): The read domain to fill.
+            write_domain (Set[Variable]): The write domain to fill.
+            nested (bool, optional): Whether the instruction is nested in another one. Defaults to False.
+        """
+
+    def __str__(self) -> str:
+        return self._str
+
+    def _build_str(self) -> str:
+        """Build the string representation of the instruction.
+
+        As instructions are not supposed to change once created,
+        it is built only once in __init__() and stored in _str.
+
+        Raises:
+            NotImplementedError: Shall be overwritten.
+
+        Returns:
+            str: The string representation.
+        """
+        raise NotImplementedError()
+
+    def refresh(self):
+        """Rebuild the cached string representation.
+
+        NOTE: Only needed when a nested Constant has been modified afterwards, like in System.randomize_variables().
+        """
+        self._str = self._build_str()
+
 class Sleep(Instruction):
-    def __init__(self, seconds:int):
+    """Sleep for a given number of seconds.
+
+    In virtual time, it does not block but only advances the clock of the current thread instead.
+    The order of the executions remains the same, which is the only thing that matters to compare histories.
+    """
+    __slots__ = ('seconds',)
+    seconds: float
+
+    # Virtual time mode, see System.run()
+    virtual = False
+    clock = threading.local()
+
+    def __init__(self, seconds:float):
         self.seconds = seconds
+        self._str = self._build_str()
 
-    def __str__(self) -> str:
-        return 'Sleep({})'.format(self.seconds)
+    def _build_str(self) -> str:
+        return f'Sleep({self.seconds})'
+
+    @staticmethod
+    def sleep(seconds:float):
+        """Sleep, or only advance the clock of the current thread in virtual time.
+
+        Args:
+            seconds (float): The number of seconds.
+        """
+        if Sleep.virtual:
+            Sleep.clock.time = getattr(Sleep.clock, 'time', 0) + seconds
+        else:
+            time.sleep(seconds)
 
     def execute(self):
-        time.sleep(self.seconds)
+        Sleep.sleep(self.seconds)
+
+    def compile(self) -> Callable[[], None]:
+        # Whether the time is virtual is only known when executed
+        return self.execute
+
+    def emit_source(self, generator:SourceGenerator) -> str:
+        generator.call(Sleep.sleep, self.seconds)
+        return 'None'
 
 class Constant(Instruction):
     """Represents a simple integer as an Instruction.
     """
+    __slots__ = ('value',)
+    value: int
+
     def __init__(self, value:int):
         self.value = value
+        self._str = self._build_str()
 
-    def __str__(self) -> str:
+    def _build_str(self) -> str:
         return str(self.value)
 
     def execute(self) -> int:
         return self.value
 
+    def compile(self) -> Callable[[], int]:
+        value = self.value
+        return lambda: value
+
+    def emit_source(self, generator:SourceGenerator) -> str:
+        return repr(self.value)
+
 class Read(Instruction):
+    __slots__ = ('variable',)
+    variable: Variable
+
     def __init__(self, variable:Variable):
         self.variable = variable
+        self._str = self._build_str()
 
-    def __str__(self) -> str:
+    def _build_str(self) -> str:
         return self.variable.name
-    
+
     def execute(self) -> int:
         """Attempt to read the variable.
 
@@ -73,7 +373,20 @@ class Read(Instruction):
         Returns:
             int: The value stored in the variable.
         """
-        return int(self.variable)
+        # Read directly rather than through Variable.__int__()
+        value = self.variable.value
+        if value is None:
+            raise ValueError("The variable {} has not been initialized.".format(self.variable))
+        return value
+
+    def compile(self) -> Callable[[], int]:
+        return self.execute
+
+    def emit_source(self, generator:SourceGenerator) -> str:
+        return generator.read(self.variable)
+
+    def collect_domains(self, read_domain:Set[Variable], write_domain:Set[Variable], nested:bool=False):
+        read_domain.add(self.variable)
 
 def convert_to_variable(variable:Union[Variable, str, None]) -> Union[Variable, None]:
     """Convert a string to a variable."""
@@ -86,17 +399,29 @@ def convert_to_variable(variable:Union[Variable, str, None]) -> Union[Variable,
         raise ValueError("Something else than a Variable() instance has been detected : {}.".format(variable))
     return variable
 
+# Conversions to an instruction, by the exact type of the converted value.
+_CONVERTERS = {
+    # Attempt to read the given variable
+    # to convert it to a variable
+    # then to an instruction
+    str: lambda name: Read(Variable[name]),
+    Variable: Read,
+    # Transform the integer to a Constant
+    int: Constant,
+    bool: Constant,
+}
+
 def convert_to_instruction(instruction:Union[Variable, Instruction, str, int]) -> Instruction:
     """Convert a variable, an integer, a string to an instruction."""
 
-    if isinstance(instruction, Variable) or isinstance(instruction, str):
-        # Attempt to read the given variable
-        # to convert it to a variable
-        # then to an instruction
-        instruction = Read(convert_to_variable(instruction))
-    elif isinstance(instruction, int):
-        # Transform the integer to a Constant
-        instruction = Constant(instruction)
+    converter = _CONVERTERS.get(type(instruction))
+    if converter:
+        return converter(instruction)
+    # Subclasses, if any, are still converted
+    if isinstance(instruction, (Variable, str)):
+        return Read(convert_to_variable(instruction))
+    if isinstance(instruction, int):
+        return Constant(instruction)
     return instruction
 
 class Assign(Instruction):
@@ -117,6 +442,9 @@ class Assign(Instruction):
         Assign(Variable('x'), 'y')
         Assign(Variable('x'), Variable('y'))
     """
+    __slots__ = ('variable', 'instruction')
+    variable: Variable
+    instruction: Instruction
 
     def __init__(self, variable:Union[Variable, str], instruction:Union[Variable, Instruction, str, int]):
         self.variable = convert_to_variable(variable)
@@ -125,21 +453,48 @@ class Assign(Instruction):
         if isinstance(instruction, Sleep):
             raise ValueError('Assign() is not intended to work with Sleep().')
         self.instruction = instruction
-    
-    def __str__(self) -> str:
+        self._str = self._build_str()
+
+    def _build_str(self) -> str:
         i = str(self.instruction)
         if isinstance(self.instruction, Operator):
-            i = '({})'.format(i)
-        return '{} = {}'.format(self.variable.name, i)
+            i = f'({i})'
+        return f'{self.variable.name} = {i}'
+
+    def refresh(self):
+        self.instruction.refresh()
+        super().refresh()
 
     def execute(self):
         value = self.instruction.execute()
         self.variable.value = value
 
+    def compile(self) -> Callable[[], None]:
+        variable = self.variable
+        instruction = self.instruction.compile()
+
+        def execute():
+            variable.value = instruction()
+        return execute
+
+    def emit_source(self, generator:SourceGenerator) -> str:
+        return generator.write(self.variable, self.instruction.emit_source(generator))
+
+    def collect_domains(self, read_domain:Set[Variable], write_domain:Set[Variable], nested:bool=False):
+        write_domain.add(self.variable)
+        self.instruction.collect_domains(read_domain, write_domain, nested=True)
+
 ########################################
 # Operators
 ########################################
 class Operator(Instruction):
+    __slots__ = ('variable', 'operation', 'i1', 'i2', '_op_symbol')
+    variable: Optional[Variable]
+    operation: Callable[[int, int], int]
+    i1: Instruction
+    i2: Instruction
+    _op_symbol: str
+
     def __init__(self, i1:Union[Variable, Instruction, str, int], i2:Union[Variable, Instruction, str, int], operation:Callable[[int, int], int], variable:Optional[Union[Variable, str]]=None):
         """Initialize a prototype type later used for basic operations like +, -, /, *.
 
@@ -151,50 +506,134 @@ class Operator(Instruction):
         """
         self.variable = convert_to_variable(variable)
         self.operation = operation
+        # Fail early with an unsupported operation
+        # rather than when representing it.
+        try:
+            self._op_symbol = _OP_SYMBOL[operation]
+        except KeyError:
+            raise ValueError("Unsupported operation : {}.".format(operation))
         self.i1 = self.__convert(i1)
         self.i2 = self.__convert(i2)
+        self._str = self._build_str()
 
-    def __str__(self) -> str:
+    def _build_str(self) -> str:
         i1 = str(self.i1)
         i2 = str(self.i2)
 
         if isinstance(self.i1, Operator):
-            i1 = '({})'.format(i1)
+            i1 = f'({i1})'
         if isinstance(self.i2, Operator):
-            i2 = '({})'.format(i2)
-
-        if self.operation == operator.add:
-            op = '+'
-        elif self.operation == operator.sub:
-            op = '-'
-        elif self.operation == operator.floordiv:
-            op = '/'
-        elif self.operation == operator.mul:
-            op = '*'
+            i2 = f'({i2})'
 
         if not self.variable:
-            return '({} {} {})'.format(i1, op, i2)
+            return f'({i1} {self._op_symbol} {i2})'
         else:
-            return '{} = {} {} {}'.format(self.variable.name , i1, op, i2)
+            return f'{self.variable.name} = {i1} {self._op_symbol} {i2}'
+
+    def refresh(self):
+        self.i1.refresh()
+        self.i2.refresh()
+        super().refresh()
+
+    def execute(self) -> int:
+        """Returns the result, also stored in the variable if one has been provided.
 
-    def execute(self) -> Union[Variable, int] :
-        """Returns a variable or a int.
-        
-        In the latter case, no variable has been provided to store the result.
         Used when nesting operations inside outer ones like this (althought it is possible to store the nested result in a variable then read the variable just after) :
 
             Add('z', Add(10, 10), 'y')
             Add('z', Add(10, 10, 'n'), 'y')
 
+        NOTE: The subclasses compute the result inline, e.g. with +, rather than calling operation.
+
         Returns:
-            Union[Variable, int]: Returns a variable to store the result. Otherwise an integer.
+            int: The result.
         """
-        value = self.operation(int(self.i1.execute()), int(self.i2.execute()))
-        if not self.variable:
+        return self._store(self.operation(self.i1.execute(), self.i2.execute()))
+
+    def _store(self, value:int) -> int:
+        """Store the result in the variable, if one has been provided.
+
+        Args:
+            value (int): The result.
+
+        Returns:
+            int: The same result.
+        """
+        if self.variable:
+            self.variable.value = value
+        return value
+
+    def _fold(self) -> Optional[int]:
+        """Evaluate the operation if its operands are constants,
+        or nested operations of constants not storing their result.
+
+        NOTE: The constants may change afterwards (see System.randomize_variables()), so it is only done when compiling.
+
+        Returns:
+            Optional[int]: The result, None if it cannot be known before the execution.
+        """
+        values = []
+        for instruction in (self.i1, self.i2):
+            if isinstance(instruction, Constant):
+                values.append(instruction.value)
+            elif isinstance(instruction, Operator) and not instruction.variable:
+                value = instruction._fold()
+                if value is None:
+                    return None
+                values.append(value)
+            else:
+                return None
+
+        # A division by zero is left to be raised when executed
+        if self.operation == operator.floordiv and values[1] == 0:
+            return None
+        return self.operation(*values)
+
+    def compile(self) -> Callable[[], int]:
+        """Unlike execute(), the closure always returns an integer,
+        even when the result is stored in a variable.
+
+        The operations of constants are folded, see _fold().
+        """
+        variable = self.variable
+        value = self._fold()
+        if value is not None:
+            if not variable:
+                return lambda: value
+
+            def execute() -> int:
+                variable.value = value
+                return value
+            return execute
+
+        operation = self.operation
+        i1 = self.i1.compile()
+        i2 = self.i2.compile()
+
+        if not variable:
+            return lambda: operation(i1(), i2())
+
+        def execute() -> int:
+            value = operation(i1(), i2())
+            variable.value = value
             return value
+        return execute
 
-        self.variable.value = value
-        return self.variable
+    def emit_source(self, generator:SourceGenerator) -> str:
+        expression = generator.operation(self.operation, self.i1.emit_source(generator), self.i2.emit_source(generator))
+        if not self.variable:
+            return expression
+        return generator.write(self.variable, expression)
+
+    def collect_domains(self, read_domain:Set[Variable], write_domain:Set[Variable], nested:bool=False):
+        if self.variable:
+            # A nested operation with a defined variable stores its result in it,
+            # so the variable will be read, so it is added to the read domain.
+            if nested:
+                read_domain.add(self.variable)
+            write_domain.add(self.variable)
+        self.i1.collect_domains(read_domain, write_domain, nested=True)
+        self.i2.collect_domains(read_domain, write_domain, nested=True)
 
     def __convert(self, instruction:Union[Variable, Instruction, str, int]) -> Instruction:
         instruction = convert_to_instruction(instruction)
@@ -205,17 +644,37 @@ class Operator(Instruction):
         return instruction
 
 class Add(Operator):
+    __slots__ = ()
+
     def __init__(self, i1:Union[Variable, Instruction, str, int], i2:Union[Variable, Instruction, str, int], variable:Optional[Union[Variable, str]]=None):
         super().__init__(i1, i2, operator.add, variable)
 
+    def execute(self) -> int:
+        return self._store(self.i1.execute() + self.i2.execute())
+
 class Sub(Operator):
+    __slots__ = ()
+
     def __init__(self, i1:Union[Variable, Instruction, str, int], i2:Union[Variable, Instruction, str, int], variable:Optional[Union[Variable, str]]=None):
-        super().__init__(i1, i2, operator.add, variable)
+        super().__init__(i1, i2, operator.sub, variable)
+
+    def execute(self) -> int:
+        return self._store(self.i1.execute() - self.i2.execute())
 
 class Mul(Operator):
+    __slots__ = ()
+
     def __init__(self, i1:Union[Variable, Instruction, str, int], i2:Union[Variable, Instruction, str, int], variable:Optional[Union[Variable, str]]=None):
         super().__init__(i1, i2, operator.mul, variable)
 
+    def execute(self) -> int:
+        return self._store(self.i1.execute() * self.i2.execute())
+
 class Div(Operator):
+    __slots__ = ()
+
     def __init__(self, i1:Union[Variable, Instruction, str, int], i2:Union[Variable, Instruction, str, int], variable:Optional[Union[Variable, str]]=None):
-        super().__init__(i1, i2, operator.floordiv, variable)
\ No newline at end of file
+        super().__init__(i1, i2, operator.floordiv, variable)
+
+    def execute(self) -> int:
+        return self._store(self.i1.execute() // self.i2.execute())
\ No newline at end of file
@@ -1,12 +1,14 @@
 from typing import *
+from concurrent.futures import ThreadPoolExecutor, wait
 from contextlib import contextmanager
 from rich import print
 from rich.console import Console
 from rich.pretty import pprint
-import bs4
 import copy
 import itertools
 import graphviz
+import html
+import os
 import pathvalidate
 import random
 import threading
@@ -14,7 +16,7 @@ import time
 import toposort
 
 from systeme.task import Task
-from systeme.instruction import Instruction, Assign, Constant, Operator
+from systeme.instruction import Assign, Constant, Operator, Sleep, SourceGenerator
 from systeme.variable import Variable
 
 @contextmanager
@@ -38,8 +40,13 @@ class System:
     def __init__(self, name:str='System', tasks:Optional[List[Task]]=None):
         self.name = name
         self.tasks = tasks if tasks else []
+        self._deterministic = None
+        self._memory_cells = None
+        self._reachability = None
         if self.is_cyclic():
             raise RuntimeError("The system is cyclic.")
+        # Needed by the determinism check
+        self._compute_schedule()
         if not self.is_deterministic():
             raise RuntimeError("The system is not determined.")
 
@@ -48,24 +55,54 @@ class System:
 
         self.history = {}
         self.histories = []
+        # The last state of the variables, for each history, as a hashable snapshot
+        self.states = []
 
         self.executions = 0
 
+        # Reused by every run, instead of a new one each time
+        self._console = Console()
+
+        # Threads are started once for all the executions
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.tasks)), thread_name_prefix=self.name)
+
+    def __enter__(self) -> 'System':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Shut down the threads used to execute the tasks."""
+        self._pool.shutdown()
+
     ########################################
     # Tasks
     ########################################
-    def get_memory_cells(self) -> Set[Variable]:
-        """Get variables used by every tasks.
+    def copy_tasks(self) -> List[Task]:
+        """Copy the tasks, with their instructions and dependencies, like in Sequential and Parallelize.
+
+        The variables are shared rather than copied, as they are already unique by their name (see Variable.VARIABLES);
+        the systems are never executed at the same time, and each run resets them first.
+        The instructions are still copied, for the copied tasks to be randomized independently (see randomize_variables()).
 
         Returns:
-            Set[Variable]: A set of every used variable.
+            List[Task]: The copied tasks, depending on each other as the given ones do.
         """
-        cells = set()
+        memo = {id(cell): cell for cell in self.get_memory_cells()}
+        return copy.deepcopy(self.tasks, memo)
 
-        for task in self.tasks:
-            cells = cells.union(task.get_memory_cells())
-        
-        return cells
+    def get_memory_cells(self) -> FrozenSet[Variable]:
+        """Get variables used by every tasks.
+
+        NOTE: The set is cached until the schedule is computed again, see _compute_schedule().
+
+        Returns:
+            FrozenSet[Variable]: A set of every used variable.
+        """
+        if self._memory_cells is None:
+            self._memory_cells = frozenset().union(*(task.get_memory_cells() for task in self.tasks))
+        return self._memory_cells
 
     ########################################
     # System-related methods
@@ -76,31 +113,33 @@ class System:
 
     def is_cyclic(self) -> bool:
         """Determines if the system contains a cycle.
+        The tasks are sorted topologically without recursion, a cycle leaving some of them out.
 
         Returns:
             bool: A cycle has been detected.
         """
-        def recurse(task:Task, explored:Set[Task], tracking:Set[Task]) -> bool:
-            explored.add(task)
-            tracking.add(task)
-
-            for dependency in task.dependencies:
-                if dependency not in explored:
-                    if recurse(dependency, explored, tracking):
-                        return True
-                elif dependency in tracking:
-                    return True
+        # Ignored by toposort
+        if any(task in task.dependencies for task in self.tasks):
+            return True
+
+        graph = {task: set(task.dependencies) for task in self.tasks}
+        try:
+            toposort.toposort_flatten(graph, sort=False)
+        except toposort.CircularDependencyError:
+            return True
+        return False
 
-            tracking.remove(task)
-            return False
+    def _check_dependencies(self):
+        """Check that every dependency is a task of the system.
 
-        explored = set()
-        tracking = set()
+        Raises:
+            ValueError: Raised when a task depends on a task which is not in the system.
+        """
+        tasks = set(self.tasks)
         for task in self.tasks:
-            if task not in explored:
-                if recurse(task, explored, tracking):
-                    return True
-        return False
+            for dependency in task.dependencies:
+                if dependency not in tasks:
+                    raise ValueError('{} depends on {}, which is not in the system.'.format(task, dependency))
 
     def is_equivalent(self, system:'System') -> bool:
         """Determines if these systems are equivalent.
@@ -125,23 +164,92 @@ class System:
         if n < 1:
             raise RuntimeError('The systems have to be executed at least once.')
 
-        for i in range(min(self.executions, system.executions)):
-            for name, cell in self.histories[i].items():
-                if self.histories[i][name].value != system.histories[i][name].value:
-                    return False
-        return True
+        # Same variables, thus the same states if they have the same values.
+        return self.states[:n] == system.states[:n]
 
     def is_deterministic(self) -> bool:
         """Determines if the system is deterministic.
 
+        NOTE: The result is cached until the schedule is computed again, see _compute_schedule().
+
         Returns:
             bool: The system is determinstic if each pair of two tasks t1, t2 from the system are not interfering with each other.
         """
-        for t1, t2 in itertools.combinations(self.tasks, r=2):
-            if t1.is_interfering(t2):
-                return False
+        if self._deterministic is None:
+            # Same as Task.is_interfering(), only for the conflicting pairs
+            # and with the paths looked for in constant time
+            conflicts = self._get_conflicts()
+            self._deterministic = not any(
+                not (self.is_connected(t1, t2) or self.is_connected(t2, t1))
+                for t1 in self.tasks for t2 in conflicts[t1]
+            )
+        return self._deterministic
+
+    def _get_conflicts(self) -> Dict[Task, Set[Task]]:
+        """Get the tasks conflicting with each task, see Task.is_conflicting().
+
+        Instead of comparing the domains of every pair of tasks,
+        the tasks are indexed by the variables they read and write :
+        only a writer and another task using the same variable may conflict.
+
+        Returns:
+            Dict[Task, Set[Task]]: The conflicting tasks, for each task.
+        """
+        writers = {}
+        readers = {}
+        for task in self.tasks:
+            for variable in task.write_domain:
+                writers.setdefault(variable, []).append(task)
+            for variable in task.read_domain:
+                readers.setdefault(variable, []).append(task)
+
+        conflicts = {task: set() for task in self.tasks}
+        for variable, tasks in writers.items():
+            for writer in tasks:
+                conflicts[writer].update(tasks)
+                conflicts[writer].update(readers.get(variable, []))
+            for reader in readers.get(variable, []):
+                conflicts[reader].update(tasks)
+
+        for task in self.tasks:
+            conflicts[task].discard(task)
+        return conflicts
 
-        return True
+    def is_connected(self, t1:Task, t2:Task) -> bool:
+        """Determines if the first task depends on the second one, directly or not, see Task.is_connected().
+
+        The ancestors of every task are computed once as bitsets (see __get_reachability()),
+        so that it is only a bitwise operation instead of walking through the dependencies.
+
+        Args:
+            t1 (Task): The current task.
+            t2 (Task): The searched task.
+
+        Returns:
+            bool: Indicates if it is connected.
+        """
+        bits, ancestors = self.__get_reachability()
+        return bool(ancestors[t1] & bits[t2])
+
+    def __get_reachability(self) -> Tuple[Dict[Task, int], Dict[Task, int]]:
+        """Get a bit for each task, as well as the bitset of its ancestors, in a single pass in topological order.
+
+        NOTE: It is cached until the schedule is computed again, see _compute_schedule().
+
+        Returns:
+            Tuple[Dict[Task, int], Dict[Task, int]]: The bit of each task and the bitset of its ancestors.
+        """
+        if self._reachability is None:
+            bits = {task: 1 << i for i, task in enumerate(self._topo_order)}
+
+            ancestors = {}
+            for task in self._topo_order:
+                bitset = 0
+                for dependency in task.dependencies:
+                    bitset |= bits[dependency] | ancestors[dependency]
+                ancestors[task] = bitset
+            self._reachability = (bits, ancestors)
+        return self._reachability
 
     def are_histories_equal(self) -> bool:
         """Check if every and each one of the histories is equal to each other.
@@ -157,19 +265,15 @@ class System:
             raise RuntimeError('The system has not been executed yet.')
         if self.executions == 1:
             raise RuntimeError('The system has been executed only once.')
-        for cell in self.get_memory_cells():
-            for i, j in itertools.combinations(range(self.executions), r=2):
-                if self.histories[i][cell.name].value != self.histories[j][cell.name].value:
-                    return False
-        return True
+        # They are all equal if there is only one distinct state.
+        return len(set(self.states)) == 1
     
     ########################################
     # Drawing graphs
     ########################################
     def __generate_label(self, task:Task) -> str:
         """Generate the label to represent the task on the graph.
-        It is generated by the HTML source code from the module bs4,
-        as Graphviz can use HTML-like tags.
+        It is an HTML-like table, as Graphviz can use HTML-like tags.
 
         Args:
             task (Task): The task to represent.
@@ -177,34 +281,23 @@ class System:
         Returns:
             str: The formatted label ready to be used by Graphviz.
         """
-        soup = bs4.BeautifulSoup('', 'html.parser')
-
-        table = soup.new_tag('TABLE')
-
-        # Title
-        tr = soup.new_tag('TR')
-        td = soup.new_tag('TD')
-        td['BGCOLOR'] = 'cyan'
-
-        title = soup.new_tag('B')
-        title.string = str(task.name)
+        # Title, then the instructions
+        rows = ''.join(f'<TR><TD>{html.escape(str(instruction))}</TD></TR>' for instruction in task.instructions)
+        return f'<<TABLE><TR><TD BGCOLOR="cyan"><B>{html.escape(str(task.name))}</B></TD></TR>{rows}</TABLE>>'
 
-        td.append(title)
-        tr.append(td)
-        table.append(tr)
+    def draw(self, view:bool=False):
+        """Render the graph of the system with Graphviz.
 
-        # Instructions
-        for instruction in task.instructions:
-            tr = soup.new_tag('TR')
-            td = soup.new_tag('TD')
-            td.string = str(instruction)
-            tr.append(td)
-            table.append(tr)
+        The layout is skipped when the same graph has already been rendered,
+        i.e. when the saved source is unchanged and the rendered file exists.
+        The tasks and arcs are thus emitted by name, as the order of the sets changes from one process to another.
 
-        soup.append(table)
-        return '<{}>'.format(str(soup))
+        Args:
+            view (bool, optional): Open the rendered file. Defaults to False.
+        """
+        def by_name(tasks:Iterable[Task]) -> List[Task]:
+            return sorted(tasks, key=lambda task: str(task.name))
 
-    def draw(self, view:bool=False):
         dot = graphviz.Digraph(comment='Graph of "{}"'.format(self.name))
         layers = self.get_layers()
         for i, layer in enumerate(layers):
@@ -213,84 +306,83 @@ class System:
             if i == len(layers) - 1:
                 with dot.subgraph() as subgraph:
                     subgraph.attr(rank='max')
-                    for task in layer:
+                    for task in by_name(layer):
                         subgraph.node(
                             name=str(task.name),
                             label=self.__generate_label(task),
                         )
-                        for parent in task.dependencies:
+                        for parent in by_name(task.dependencies):
                             dot.edge(tail_name=str(parent.name), head_name=str(task.name))
             else:
-                for task in layer:
+                for task in by_name(layer):
                     dot.node(
                         name=str(task.name),
                         label=self.__generate_label(task),
                     )
-                    for parent in task.dependencies:
+                    for parent in by_name(task.dependencies):
                         dot.edge(tail_name=str(parent.name), head_name=str(task.name))
 
-        filename = pathvalidate.sanitize_filepath(self.name)
-        dot.render(filename + '.gv', view=view)
+        filename = pathvalidate.sanitize_filepath(self.name) + '.gv'
+        rendered = '{}.{}'.format(filename, dot.format)
+        try:
+            with open(filename, encoding=dot.encoding) as f:
+                cached = f.read() == dot.source and os.path.exists(rendered)
+        except OSError:
+            cached = False
+
+        if not cached:
+            dot.render(filename, view=view)
+        elif view:
+            graphviz.view(rendered)
 
     ########################################
     # Tasks
     ########################################
     def disconnected_final_tasks(self) -> List[Set[Task]]:
         """Group final tasks by their respective disconnected subgraphs.
+
+        The subgraphs are found with a union-find over the arcs, regardless of their direction.
+
+        Raises:
+            ValueError: Raised when a task depends on a task which is not in the system.
         
         Returns:
-            List[Set[Task]]: Every group of tasks which all have different parents, or are themselves orphans.
+            List[Set[Task]]: Every group of final tasks belonging to the same subgraph.
         """
+        # The dependencies may have been modified since the schedule has been computed
+        self._check_dependencies()
+        parents = {task: task for task in self.tasks}
+
+        def find(task:Task) -> Task:
+            root = task
+            while parents[root] is not root:
+                root = parents[root]
+            # Compress the path for the next searches
+            while parents[task] is not root:
+                parents[task], task = root, parents[task]
+            return root
 
-        final_tasks = self.get_final_tasks()
-        initial_tasks = self.get_initial_tasks()
-        graphs = {task: set() for task in initial_tasks}
-
-        for task in final_tasks:
-            if not task.dependencies:
-                graphs[task].add(task)
-                continue
-
-        for task in initial_tasks.difference(final_tasks):
-            for t1, t2 in itertools.product(final_tasks, repeat=2):
-                c1 = t1.is_connected(task)
-                c2 = t2.is_connected(task)
-                if not c1 and c2:
-                    for k, v in graphs.items():
-                        if t2 in v:
-                            graphs[k].add(t2)
-                            break 
-                    else:
-                        graphs[task].add(t2)
-                elif c1 and not c2:
-                    for k, v in graphs.items():
-                        if t1 in v:
-                            graphs[k].add(t1)
-                            break 
-                    else:
-                        graphs[task].add(t1)
-                elif c1 and c2:
-                    graphs[task] = graphs[task].union([t1, t2])
+        for task in self.tasks:
+            for dependency in task.dependencies:
+                parents[find(task)] = find(dependency)
+
+        graphs = {}
+        for task in self.get_final_tasks():
+            graphs.setdefault(find(task), set()).add(task)
         return list(graphs.values())
 
     def get_final_tasks(self) -> Set[Task]:
-        """Get tasks at the most bottom-level.
+        """Get tasks at the most bottom-level, i.e. the tasks no other task depends on.
         
         Returns:
-            List[Task]: Every most-bottom level tasks with orphan tasks placed first."""
-        tasks = []
+            Set[Task]: Every most-bottom level tasks."""
+        # Gathered in a single pass over the arcs,
+        # instead of looking for each task in the dependencies of every other task.
+        dependencies = set()
         for task in self.tasks:
-            for t in self.tasks:
-                if task in t.dependencies:
-                    break
-            else:
-                # Put orphan tasks first.
-                if not task.dependencies:
-                    tasks.insert(0, task)
-                else:
-                    tasks.append(task)
+            dependencies.update(task.dependencies)
 
-        return set(tasks)
+        return set(task for task in self.tasks if task not in dependencies)
 
     def get_initial_tasks(self) -> Set[Task]:
         """Get topmost-level tasks.
@@ -303,28 +395,51 @@ class System:
         """Get every tasks layer by layer.
         Solely used for generating graphs. 
 
+        Each task is placed by the longest path to a final task,
+        computed in a single pass in reversed topological order :
+        the final tasks are all in the last layer, and a task is always above its dependents.
+
         Returns:
             List[Set[Level]]: The layers of tasks, from the top-level tasks to the bottom-level ones.
         """
-        levels = []
-
-        level = set(self.get_final_tasks())
-        explored = set(level)
-        while level:
-            levels.insert(0, level)
-            children = set()
-            for task in level:
-                children = children.union(task.dependencies)
-            level = children.difference(explored)
-            explored = explored.union(children)
-        
+        heights = {}
+        for task in reversed(self._topo_order):
+            heights[task] = max((heights[dependent] + 1 for dependent in self._dependents[task]), default=0)
+
+        levels = [set() for _ in range(max(heights.values(), default=-1) + 1)]
+        for task, height in heights.items():
+            levels[-1 - height].add(task)
+
         return levels
 
+    def _compute_schedule(self):
+        """Compute the topological order of the tasks, as well as the dependents of each task.
+        It is done only once, as the dependencies do not change once the system is built,
+        and reused by the other graph walks (see get_layers() and __get_reachability()).
+
+        NOTE: It has to be called again whenever dependencies are modified, like in Sequential and Parallelize.
+
+        Raises:
+            ValueError: Raised when a task depends on a task which is not in the system.
+        """
+        self._check_dependencies()
+        graph = {task: set(task.dependencies) for task in self.tasks}
+        self._topo_order = toposort.toposort_flatten(graph, sort=False)
+
+        self._dependents = {task: [] for task in self.tasks}
+        for task in self.tasks:
+            for dependency in task.dependencies:
+                self._dependents[dependency].append(task)
+        self._initial_tasks = [task for task in self._topo_order if not task.dependencies]
+        self._deterministic = None
+        self._memory_cells = None
+        self._reachability = None
+
     ########################################
     # Stats
     ########################################
     def show(self, show_all:bool=False):
-        console = Console()
+        console = self._console
         console.rule('Stats')
         if self.executed:
             print('Time elapsed : {:.06}s'.format(self.time))
@@ -340,29 +455,55 @@ class System:
     ########################################
     # Run
     ########################################
-    def randomize_variables(self):
+    def randomize_variables(self, rng:Optional[random.Random]=None, verbose:bool=False):
         """Set random integers for variables that are affected by a constant.
         
         Assign('x', 10) will be affected.
         Assign('x', 'y') won't be.
 
         Add('x', 10, 'y') will be affected, as there is a constant.
-        """
 
-        def recurse(instructions:List[Instruction], parent:Optional[Instruction]=None):
-            for instruction in instructions:
-                if isinstance(instruction, Assign):
-                    recurse([instruction.instruction], parent=instruction)
-                elif isinstance(instruction, Operator):
-                    recurse([instruction.i1, instruction.i2], parent=instruction)
-                elif isinstance(instruction, Constant): 
-                    old_parent = str(parent)
-                    new_value = random.randint(0, 100)
-                    instruction.value = new_value
-                    print('Changing {} to {}...'.format(old_parent, str(parent)))
+        Args:
+            rng (Optional[random.Random], optional): The generator to draw the integers from, instead of the global one of the module random. Defaults to None.
+            verbose (bool, optional): Print every changed instruction. Defaults to False.
+        """
+        rng = rng if rng else random
 
+        changes = []
         for task in self.tasks:
-            recurse(task.instructions)
+            changed = False
+            for top_instruction in task.instructions:
+                # Walk through the nested instructions with a stack rather than recursively,
+                # in the same order (the children are pushed reversed) for the same seed to give the same integers.
+                stack = [(top_instruction, None)]
+                constants = False
+                while stack:
+                    instruction, parent = stack.pop()
+                    if isinstance(instruction, Assign):
+                        stack.append((instruction.instruction, instruction))
+                    elif isinstance(instruction, Operator):
+                        stack.extend(((instruction.i2, instruction), (instruction.i1, instruction)))
+                    elif isinstance(instruction, Constant):
+                        old_parent = str(parent) if verbose else None
+                        instruction.value = rng.randint(0, 100)
+                        constants = True
+                        if verbose:
+                            # Refreshed right away to show each change
+                            (parent or instruction).refresh()
+                            changes.append('Changing {} to {}...'.format(old_parent, str(parent)))
+
+                # The string representations are cached : rebuilt once all the constants have changed,
+                # refresh() going through the nested instructions
+                if constants:
+                    top_instruction.refresh()
+                changed = changed or constants
+
+            if changed:
+                task.compile()
+
+        # Printed all at once
+        if changes:
+            print('\n'.join(changes))
 
     def reset_memory_cells(self):
         """Empty every variable from their history and their value."""
@@ -381,45 +522,102 @@ class System:
 
     def save_history(self):
         """Save the last state of variables and the time elapsed.
-        Both of them are appended to their respective list for later.
+        Both of them are appended to their respective list for later,
+        as well as a hashable snapshot of the state.
         """
-        self.history = {cell.name: cell for cell in copy.deepcopy(self.get_memory_cells())}
+        self.history = {cell.name: cell.snapshot() for cell in self.get_memory_cells()}
         self.histories.append(self.history)
+        self.states.append(frozenset((name, cell.value) for name, cell in self.history.items()))
 
         self.executions += 1
         self.times.append(self.time)
 
+    def _execute_tasks(self, verbose:bool=True) -> float:
+        """Execute every task with the pool of threads.
+
+        A task is submitted as soon as its last dependency has been executed,
+        instead of waiting for every task of the same level.
+        The worker executing the last dependency keeps one of the ready tasks for itself
+        while the other ones are submitted to the idle workers.
+
+        The dependencies executed so far are counted without any lock:
+        next() on an itertools.count() is atomic under the GIL,
+        so only the thread drawing the last count sees the task as ready.
+
+        In virtual time (see Sleep), a task starts at the time its last dependency has finished.
+
+        When a task fails, no other task is started, and the ones still running are waited for before raising,
+        so that none of them writes the variables afterwards.
+
+        Args:
+            verbose (bool, optional): Passed to Task.execute(). Defaults to True.
+
+        Raises:
+            Exception: The first exception raised by a task, if any.
+
+        Returns:
+            float: The virtual time at which the last task has finished, 0 if the time is not virtual.
+        """
+        counters = {task: itertools.count(1) for task in self.tasks}
+        executed = itertools.count(1)
+        finish_times = {}
+        finished = threading.Event()
+        errors = []
+        # Every submitted execution, to wait for the running ones when a task fails
+        futures = []
+
+        def execute(task:Task):
+            while task is not None:
+                if Sleep.virtual:
+                    Sleep.clock.time = max((finish_times[dependency] for dependency in task.dependencies), default=0)
+                try:
+                    task.execute(verbose=verbose)
+                # Also SystemExit and KeyboardInterrupt, which would otherwise be swallowed by the future,
+                # leaving the main thread waiting forever
+                except BaseException as e:
+                    errors.append(e)
+                    finished.set()
+                    return
+
+                # Known before any dependent may start
+                if Sleep.virtual:
+                    finish_times[task] = Sleep.clock.time
+
+                ready = [dependent for dependent in self._dependents[task] if next(counters[dependent]) == len(dependent.dependencies)]
+                if next(executed) == len(self.tasks):
+                    finished.set()
+
+                if errors:
+                    return
+                for dependent in ready[1:]:
+                    futures.append(self._pool.submit(execute, dependent))
+                task = ready[0] if ready else None
+
+        if not self.tasks:
+            return 0
+        for task in self._initial_tasks:
+            futures.append(self._pool.submit(execute, task))
+        finished.wait()
+
+        if errors:
+            # A worker may still submit the tasks it has made ready before seeing the error,
+            # always before its own execution ends
+            waited = 0
+            while waited < len(futures):
+                waited = len(futures)
+                wait(futures[:waited])
+            raise errors[0]
+        return max(finish_times.values(), default=0)
+
     def run(self, loops:int=1, verbose:bool=True):
-        """Run the tasks with threads recursively from the bottom."""
-
-        def execute_tasks_parallel(tasks:Set[Task]):
-            """The function will recurse from the bottom,
-            until no dependency is remaining.
-
-            Once there is not any dependency left, the threads will finally start.
-            Thus, the first threads to start are the one corresponding to the top-level tasks.
-
-            NOTE : does not work properly with disconnected graphs.
-
-            Args:
-                tasks (Set[Task]): The tasks to recurse from.
-            """
-            threads = []
-            
-            for task in tasks:
-                if not task.executed:
-                    thread = threading.Thread(target=task.execute, kwargs={'verbose': verbose})
-                    threads.append(thread)
-
-                # Recurse throught every dependencies
-                execute_tasks_parallel(task.dependencies)
-            for thread in threads:
-                thread.start()
-            for thread in threads:
-                thread.join()
-            
+        """Run the tasks with the pool of threads, each one as soon as its dependencies have been executed.
+
+        In virtual time (see Sleep), the time elapsed is the virtual one,
+        i.e. the duration of the longest chain of dependencies.
+        """
+
         if verbose:
-            console = Console()
+            console = self._console
             console.rule(title=self.name)
 
         for loop in range(loops):
@@ -428,15 +626,8 @@ class System:
 
             self.reset()
             with timer() as measure_time:
-                # Execute in parallel the algorithm for disconnected graphs.
-                threads = []
-                for block in self.disconnected_final_tasks():
-                    thread = threading.Thread(target=execute_tasks_parallel, args=(block,))
-                    thread.start()
-                    threads.append(thread)
-                for thread in threads:
-                    thread.join()
-            self.time = measure_time()
+                virtual_time = self._execute_tasks(verbose=verbose)
+            self.time = float(virtual_time) if Sleep.virtual else measure_time()
             self.save_history()
 
             if verbose:
@@ -448,29 +639,84 @@ class System:
 class Sequential(System):
     def __init__(self, system:System):
         name = '{} - Sequential'.format(system.name)
-        super().__init__(name=name, tasks=copy.deepcopy(system.tasks))
+        super().__init__(name=name, tasks=system.copy_tasks())
 
         graph = {task: task.dependencies for task in self.tasks}
-        # If needed, to 'compare' tasks, sort them by their name, as implemented in Task().
-        flatten = toposort.toposort_flatten(graph)
-        for i in range(0, len(flatten) - 1):
-            flatten[i+1].dependencies = flatten[i]
+        # Sort the tasks of each level by their name, for the order to be the same from a run to another.
+        # Integer names are placed first, as they cannot be compared to string ones.
+        flatten = [task for level in toposort.toposort(graph) for task in sorted(level, key=lambda task: (isinstance(task.name, str), task.name))]
+        # The tasks are already copies, so chaining them does not affect the given system.
+        if flatten:
+            flatten[0].dependencies = set()
+        for previous, task in zip(flatten, flatten[1:]):
+            task.dependencies = {previous}
         
         self.tasks = flatten
-    
-class Parallelize(System):
-    def __init__(self, system:System):
-        name = '{} - Parallelized'.format(system.name)
-        super().__init__(name=name, tasks=copy.deepcopy(system.tasks))
+        self._compute_schedule()
+        self.compile()
+
+    def compile(self):
+        """Compile every instruction of every task, in the sequential order, into a single function (see SourceGenerator).
+        The instructions are thus executed without walking through each one of them.
+
+        NOTE: If an instruction cannot be expressed as source code, the tasks are executed one by one instead, without any function.
+        """
+        generator = SourceGenerator()
+        try:
+            for task in self._topo_order:
+                for instruction in task.instructions:
+                    generator.evaluate(instruction.emit_source(generator))
+        except NotImplementedError:
+            self._function = None
+            return
+
+        self._function = generator.build(name='sequential')
+        self._inputs = generator.inputs
+        self._writes = generator.writes
+
+    def randomize_variables(self, rng:Optional[random.Random]=None, verbose:bool=False):
+        super().randomize_variables(rng=rng, verbose=verbose)
+        self.compile()
+
+    def _execute_tasks(self, verbose:bool=True) -> float:
+        """Execute the compiled function, except in verbose mode
+        where the tasks are executed one by one to show their instructions, or without any compiled function.
+        """
+        if verbose or self._function is None:
+            return super()._execute_tasks(verbose=verbose)
 
-        # Adding arcs everywhere
-        for t1, t2 in ((x, y) for x, y in itertools.product(self.tasks, repeat=2) if x.is_connected(y)):
-            t1.dependencies.add(t2)
+        if Sleep.virtual:
+            Sleep.clock.time = 0
+        for variable, value in zip(self._writes, self._function(*[int(variable) for variable in self._inputs])):
+            variable.value = value
+        for task in self.tasks:
+            task.executed = True
 
-        # Attempting to remove arcs
-        # in a way the system remains deterministic
-        for t1, t2 in ((x, y) for x, y in itertools.product(self.tasks, repeat=2) if x.is_connected(y)):
-            t1.dependencies.remove(t2)
+        return Sleep.clock.time if Sleep.virtual else 0
 
-            if not self.is_deterministic():
-                t1.dependencies.add(t2)
\ No newline at end of file
+class Parallelize(System):
+    def __init__(self, system:System):
+        name = '{} - Parallelized'.format(system.name)
+        super().__init__(name=name, tasks=system.copy_tasks())
+
+        # Ancestors of each task in the given system, in topological order
+        ancestors = {}
+        for task in self._topo_order:
+            ancestors[task] = set(task.dependencies).union(*(ancestors[dependency] for dependency in task.dependencies))
+
+        # Only the pairs of conflicting tasks have to remain ordered, as given.
+        # The required ancestors are thus the conflicting ones, and transitively their own required ancestors.
+        conflicts = self._get_conflicts()
+        required = {}
+        for task in self._topo_order:
+            required[task] = set()
+            for ancestor in ancestors[task].intersection(conflicts[task]):
+                required[task].add(ancestor)
+                required[task].update(required[ancestor])
+
+        # Keep only the arcs which are not implied by another path (transitive reduction)
+        for task in self._topo_order:
+            implied = set().union(*(required[ancestor] for ancestor in required[task]))
+            task.dependencies = required[task].difference(implied)
+
+        self._compute_schedule()
\ No newline at end of file
@@ -1,22 +1,39 @@
 from typing import *
-from datetime import datetime
 from rich import print
-from rich.panel import Panel
-from rich.pretty import Pretty, pprint
-from uuid import uuid4
-import copy
+from rich.pretty import pprint
+from rich.text import Text
+import collections
+import time
 
 from systeme.variable import Variable
-from systeme.instruction import Instruction, Assign, Operator, Read, Constant
+from systeme.instruction import Instruction, SourceGenerator
+
+try:
+    import numba
+except ImportError:
+    # The generated functions are then executed as plain Python.
+    numba = None
+
+# Functions generated for the tasks, by their source code, the least recently used first.
+# The copied tasks (see System) share the same source code, thus the same function.
+_KERNELS = collections.OrderedDict()
+# The constants are part of the source code, each randomization (see System.randomize_variables()) giving new functions
+_KERNELS_LIMIT = 256
+
+# Numba computes with int64, Python integers are unbounded
+_INT64_MAX = 2 ** 63 - 1
 
 def current_time() -> str:
-    """Get the current time in HH:MM:SS.
+    """Get the current time in HH:MM:SS:ffffff.
+
+    Formatted by hand, which is cheaper than creating a datetime and formatting it with strftime().
 
     Returns:
         str: The date formatted in string.
     """
-    now = datetime.now()
-    return now.strftime('[%H:%H:%S:%f]')
+    now = time.time()
+    local = time.localtime(now)
+    return '[{:02d}:{:02d}:{:02d}:{:06d}]'.format(local.tm_hour, local.tm_min, local.tm_sec, int(now % 1 * 1_000_000))
 
 class Task:
     """A 'task' will consist of only simple instructions like :
@@ -38,7 +55,8 @@ class Task:
         ])
     """
     ID = 1
-    Tasks = []
+    # Every task by its name, in the order they have been created
+    Tasks = {}
 
     def __init__(self,
         instructions:Optional[List[Instruction]] = None,
@@ -46,20 +64,24 @@ class Task:
         name:Optional[Union[str, int]]=None,
     ):
         self.name = name
+        # Raise an exception if a task with the name already exists, before compiling anything
+        # Don't want to bother considering this case
+        if self.name in self.__class__.Tasks:
+            raise ValueError('{} already exists.'.format(self.__class__.Tasks[self.name]))
+
         self.instructions = instructions if instructions else []
         self.dependencies = dependencies if dependencies else []
         self.executed = False
+        self.compile()
 
-        self.read_domain = self.__get_read_domain()
-        self.write_domain = self.__get_write_domain()
-            
-        # Raise an exception if a task with the name already exists
-        # Don't want to bother considering this case
-        try:
-            existing_task = next((x for x in self.__class__.get_all_tasks() if x == self))
-            raise ValueError('{} already exists.'.format(existing_task))
-        except StopIteration:
-            self.__class__.Tasks.append(self)
+        self.read_domain, self.write_domain = self.__get_domains()
+        # The domains as bitsets, see Variable.bit
+        self.read_mask = sum(variable.bit for variable in self.read_domain)
+        self.write_mask = sum(variable.bit for variable in self.write_domain)
+        # The instructions do not change, neither do the domains
+        self._memory_cells = self.write_domain.union(self.read_domain)
+
+        self.__class__.Tasks[self.name] = self
 
     def __repr__(self) -> str:
         return 'Task({})'.format(self.name)
@@ -76,7 +98,10 @@ class Task:
         return self.name == o.name
 
     def __lt__(self, o:Any) -> bool:
-        """Needed for topological sorting."""
+        """Orders the tasks by name.
+
+        NOTE: The topological sorts do not rely on it, they only follow the dependencies (see System._compute_schedule()).
+        """
         if not isinstance(o, Task):
             return False
 
@@ -108,19 +133,110 @@ class Task:
         
         self._name = name
 
+    def __getstate__(self) -> Dict[str, Any]:
+        """The compiled closures are not copied along with the task (see System.copy_tasks()),
+        as they would still refer to the instructions of the original task.
+        """
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+        state['_kernel'] = None
+        return state
+
+    def compile(self) -> List[Callable[[], Optional[int]]]:
+        """Compile every instruction into a closure, see Instruction.compile().
+        They are stored to be reused on each execution.
+
+        NOTE: It has to be called again whenever an instruction is modified, like in System.randomize_variables().
+
+        Returns:
+            List[Callable[[], Optional[int]]]: The compiled instructions, in the same order.
+        """
+        self._compiled = [instruction.compile() for instruction in self.instructions]
+        self._kernel = self.__compile_kernel()
+        return self._compiled
+
+    def __compile_kernel(self) -> Optional[Tuple[Callable[..., Tuple[int, ...]], Callable[..., Tuple[int, ...]], List[Variable], List[Variable]]]:
+        """Compile the whole task into a single flat function, see SourceGenerator.
+        Its execution thus costs a single call, whatever the number of instructions and how nested they are.
+
+        Only purely arithmetic tasks are compiled, i.e. without any call like Sleep() :
+        the results are affected once the function has returned, which would otherwise be delayed past the calls.
+        The function is also compiled with Numba if available.
+        It is done right away, so that the first execution does not pay for it.
+        As Numba computes with int64, it is only done when no value may overflow (see SourceGenerator.bound),
+        the plain Python function being kept for the inputs beyond SourceGenerator.INPUT_BOUND.
+
+        Returns:
+            Optional[Tuple[Callable[..., Tuple[int, ...]], Callable[..., Tuple[int, ...]], List[Variable], List[Variable]]]: The function, its plain Python version, the variables to give as arguments and the variables to affect the results to. None if an instruction cannot be expressed as source code, or if the task is not purely arithmetic.
+        """
+        generator = SourceGenerator()
+        try:
+            for instruction in self.instructions:
+                generator.evaluate(instruction.emit_source(generator))
+        except NotImplementedError:
+            return None
+        if generator.globals:
+            return None
+
+        source = generator.generate()
+        kernel = _KERNELS.get(source)
+        if kernel is not None:
+            _KERNELS.move_to_end(source)
+        else:
+            function = generator.build()
+            kernel = (function, function)
+            if numba is not None and generator.bound <= _INT64_MAX:
+                jitted = numba.njit(function)
+                jitted.compile((numba.int64,) * len(generator.inputs))
+                kernel = (jitted, function)
+            _KERNELS[source] = kernel
+            if len(_KERNELS) > _KERNELS_LIMIT:
+                _KERNELS.popitem(last=False)
+
+        return kernel + (generator.inputs, generator.writes)
+
     def execute(self, verbose:bool=True):
-        """Execute the instructions sequentially."""
-
-        for i, instruction in enumerate(self.instructions):
-            if verbose:
-                print('[red]{}[/red] {} : [red]Starting [bold]{}[/bold][/red]...'.format(current_time(), str(self), str(instruction)))
-                instruction.execute()
-                if i < len(self.instructions) - 1:
-                    print('[green]{}[/green] {} : [green]Finished [bold]{}[/bold][/green].'.format(current_time(), str(self), str(instruction)))
-                else:
-                    print('[green]{}[/green] [strike]{}[/strike] : [green]Finished [bold]{}[/bold][/green].'.format(current_time(), str(self), str(instruction)))
-            else:
-                instruction.execute()
+        """Execute the instructions sequentially.
+
+        Unless verbose, a purely arithmetic task is executed through its generated function (see compile()),
+        which results are only affected at the end. If it fails, nothing has been affected yet :
+        the instructions are then executed one by one, so that the variables are left in the same state as in verbose mode, before raising the same error.
+
+        Args:
+            verbose (bool, optional): Show each instruction when it starts and finishes. Defaults to True.
+        """
+
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self.compile()
+
+        if verbose:
+            # Styled texts rather than markup, which rich would have to parse on each line
+            name = str(self)
+            for i, (instruction, execute) in enumerate(zip(self.instructions, compiled)):
+                print(Text.assemble((current_time(), 'red'), ' {} : '.format(name), ('Starting ', 'red'), (str(instruction), 'red bold'), '...'))
+                execute()
+                # The task is struck through once its last instruction has finished
+                style = 'strike' if i == len(self.instructions) - 1 else ''
+                print(Text.assemble((current_time(), 'green'), ' ', (name, style), ' : ', ('Finished ', 'green'), (str(instruction), 'green bold'), '.'))
+        elif self._kernel:
+            function, fallback, inputs, writes = self._kernel
+            try:
+                values = [int(variable) for variable in inputs]
+                # The compiled function is only known not to overflow for bounded inputs
+                if function is not fallback and any(abs(value) > SourceGenerator.INPUT_BOUND for value in values):
+                    function = fallback
+                results = function(*values)
+            except Exception:
+                # Without any side effect, as the task is purely arithmetic
+                for execute in compiled:
+                    execute()
+                raise
+            for variable, value in zip(writes, results):
+                variable.value = value
+        else:
+            for execute in compiled:
+                execute()
 
         self.executed = True
 
@@ -135,109 +251,115 @@ class Task:
         else:
             self._dependencies = set(dependencies)
 
-    def get_memory_cells(self) -> Set[Variable]:
+    def get_memory_cells(self) -> FrozenSet[Variable]:
         """Returns every memory cells used by the task.
 
+        NOTE: The set is computed once in __init__(), and frozen as the domains.
+
         Returns:
-            Set[Variable]: The union of the read and write domains.
+            FrozenSet[Variable]: The union of the read and write domains.
         """
-        return self.write_domain.union(self.read_domain)
+        return self._memory_cells
 
-    def __get_read_domain(self) -> Set[Variable]:
-        """Get the read domain recursively.
+    def __get_domains(self) -> Tuple[FrozenSet[Variable], FrozenSet[Variable]]:
+        """Get the read and write domains in a single walk through the nested instructions.
         
-        NOTE : only for this task, as well for the write domain."""
-
-        def recurse(i:Instruction) -> Set[Variable]:
-            result = set()
-
-            if isinstance(i, Read):
-                result.add(i.variable)
-            elif isinstance(i, Operator):
-                result = result.union(recurse(i.i1), recurse(i.i2))
-
-            return result
-
-        result = set()
-
-        # Recurse throught nested instructions
-        for i in self.instructions:
-            result = result.union(recurse(i))
-        
-        return result
-
-    def __get_write_domain(self) -> Set[Variable]:
-        """Get the write domain recursively."""
+        NOTE : only for this task. The domains are frozen, as the instructions do not change.
 
-        def recurse(i:Instruction, nested:bool=False) -> Set[Variable]:
-            result = set()
-
-            if isinstance(i, Assign):
-                result.add(i.variable)
-            elif isinstance(i, Operator) and i.variable:
-                # nested=True indicates that we are parsing nested operations with a defined variable
-                # so the variable will be read, so it is added to the read domain.
-                if nested:
-                    self.read_domain.add(i.variable)
-                result = result.union(recurse(i.i1, nested=True), recurse(i.i2, nested=True))
-                result.add(i.variable)
-
-            return result
-
-        result = set()
+        Returns:
+            Tuple[FrozenSet[Variable], FrozenSet[Variable]]: The read domain and the write domain.
+        """
+        read_domain = set()
+        write_domain = set()
 
-        # Recurse throught nested instructions
+        # Each instruction adds its own variables, see Instruction.collect_domains()
         for i in self.instructions:
-            result = result.union(recurse(i))
+            i.collect_domains(read_domain, write_domain)
 
-        return result
+        return frozenset(read_domain), frozenset(write_domain)
 
     def is_connected(self, task:'Task') -> bool:
         """Determines if the current task is connected to the supplied one.
 
         T(searched) ---- T(0) ----> T(1) ----> ... ----> T(k) ----> T(current)
 
+        The dependencies are walked through breadth-first, each task being visited only once,
+        so that a close ancestor is found before descending into unrelated branches.
+
         Args:
             task (Task): The searched task.
 
         Returns:
             bool: Indicates if it is connected.
         """
-        def recurse(search_task:'Task', current_task:'Task') -> bool:
-            if search_task in current_task.dependencies:
+        queue = collections.deque(self.dependencies)
+        visited = set(queue)
+        while queue:
+            current_task = queue.popleft()
+            if current_task == task:
                 return True
-
             for dependency in current_task.dependencies:
-                if recurse(search_task, dependency):
-                    return True
-            
-            return False
+                if dependency not in visited:
+                    visited.add(dependency)
+                    queue.append(dependency)
 
-        return recurse(task, self)
+        return False
+
+    def iter_ancestors(self) -> Iterator['Task']:
+        """Iterate over the ancestors of the task, each one once, in depth-first order.
+        They are walked through only as far as they are consumed.
+
+        Yields:
+            Task: The next ancestor.
+        """
+        stack = list(self.dependencies)
+        visited = set()
+        while stack:
+            current_task = stack.pop()
+            if current_task in visited:
+                continue
+            visited.add(current_task)
+            yield current_task
+            stack.extend(dependency for dependency in current_task.dependencies if dependency not in visited)
 
     def get_successive_ancestors(self, task:'Task') -> Optional[List['Task']]:
         """Determines the successive tasks from the current task to the searched one.
 
         T(searched) ---- T(0) ----> T(1) ----> ... ----> T(k) ----> T(current)
 
+        Each ancestor is listed once, in depth-first order, see iter_ancestors().
+
         Args:
             task (Task): The searched task.
 
         Returns:
             Optional[List[Task]]: The successive tasks, None if there is not any.
         """
-        def recurse(search_task:'Task', current_task:'Task') -> int:
-            solution = []
+        solution = list(self.iter_ancestors())
 
-            for dependency in current_task.dependencies:
-                solution += [dependency] + recurse(search_task, dependency)
-            
-            return solution
-
-        if not self.is_connected(task):
+        # The searched task has to be among the ancestors
+        if task not in set(solution):
             return None
-        return recurse(task, self)
+        return solution
     
+    def is_conflicting(self, task:'Task') -> bool:
+        """Returns a boolean, indicating if the domains of the task are conflicting with the ones of the supplied one,
+        i.e. if Bernstein's conditions are not met, whatever their dependencies.
+
+        The domains are compared as bitsets, a single operation on integers instead of intersecting sets.
+
+        Args:
+            task (Task): The task to be tested on.
+
+        Returns:
+            bool: Indicates if they conflict.
+        """
+        return bool(
+            (self.read_mask & task.write_mask) \
+            | (task.read_mask & self.write_mask) \
+            | (self.write_mask & task.write_mask)
+        )
+
     def is_interfering(self, task:'Task') -> bool:
         """Returns a boolean, indicating if the task is interfering with the supplied one.
 
@@ -247,16 +369,8 @@ class Task:
         Returns:
             bool: Indicates if it interferes.
         """
-        conditions = [
-            not self.read_domain.intersection(task.write_domain) \
-            and not task.read_domain.intersection(self.write_domain) \
-            and not self.write_domain.intersection(task.write_domain),
-
-            self.is_connected(task) or task.is_connected(self)
-            #self in task.dependencies or task in self.dependencies
-        ]
-
-        return not (conditions[0] or conditions[1])
+        # The domains are cheaper to compare than looking for a path between the tasks
+        return self.is_conflicting(task) and not (self.is_connected(task) or task.is_connected(self))
     
     def show(self):
         print('Task :', self)
@@ -274,10 +388,10 @@ class Task:
         Returns:
             List['Task']: The list of every tasks.
         """
-        return list(Task.Tasks)
+        return list(Task.Tasks.values())
     
     @staticmethod
     def reset():
-        """Empty the list containing every tasks.
+        """Forget every task, emptying the dictionary of the tasks by their name.
         """
-        Task.Tasks = []
\ No newline at end of file
+        Task.Tasks = {}
\ No newline at end of file
@@ -1,34 +1,64 @@
 from typing import *
-from uuid import uuid4
+import collections
+import sys
 
 class Variable:
+    # No __dict__, like instructions
+    __slots__ = ('name', 'history', '_value', 'bit')
+    name: str
+    history: Union[List[Optional[int]], Deque[Optional[int]]]
+    _value: Optional[int]
+    bit: int
+
     VARIABLES = {}
+    # A distinct bit for each name, see Task.is_conflicting()
+    BITS = {}
 
-    def __init__(self, name:str, value:Optional[int]=None):
-        try:
-            old = self.__class__.VARIABLES[name]
-        except KeyError:
-            old = None
+    # Whether the affected values are recorded in the history, which may be disabled for long executions
+    RECORD_HISTORY = True
+    # Only keep the last affected values, None to keep all of them
+    HISTORY_LIMIT = None
 
-        self.name = name
-        self.history = (old.history if old else [])
-        self._value = value
+    def __new__(cls, name:str, value:Optional[int]=None) -> 'Variable':
+        """There is only one variable for each name (see VARIABLES) :
+        creating a variable with a name that already exists returns the existing one,
+        so that every reference to it stays valid.
 
-        # Keep track of every created variable.
-        # If a variable with a name already exists,
-        # just overwrite it.
-        self.__class__.VARIABLES[self.name] = self
+        As a result, variables are hashed and compared by identity, like any object.
 
-    def __hash__(self) -> int:
-        # It will be stored in set(), so it is needed to be hashable.
-        return hash(self.name)
+        NOTE: A snapshot is not the variable it has been copied from (see Variable.snapshot()).
+
+        Args:
+            name (str): The name of the variable.
+            value (Optional[int], optional): The value, which replaces the current one of an existing variable. Defaults to None.
 
-    def __eq__(self, o:Any) -> bool:
-        # Variables will be compared by their name
-        # Used for sets
-        if not isinstance(o, Variable):
-            return False
-        return self.name == o.name
+        Returns:
+            Variable: The variable with this name.
+        """
+        variable = cls.VARIABLES.get(name)
+        if variable is None:
+            variable = super().__new__(cls)
+            # Interned, so that looking up names mostly comes down to comparing identities
+            variable.name = sys.intern(name)
+            variable.history = cls.new_history()
+            variable._value = None
+            variable.bit = cls.BITS.setdefault(variable.name, 1 << len(cls.BITS))
+            # Keep track of every created variable
+            cls.VARIABLES[variable.name] = variable
+        if value is not None:
+            variable._value = value
+        return variable
+
+    def __getnewargs__(self) -> Tuple[str]:
+        # Pickled variables are created again through __new__(), with their name
+        return (self.name,)
+
+    def __copy__(self) -> 'Variable':
+        # There is only one variable for each name, left untouched (see Variable.snapshot() for an actual copy)
+        return self
+
+    def __deepcopy__(self, memo:Dict[int, Any]) -> 'Variable':
+        return self
 
     def __class_getitem__(cls, name:str) -> 'Variable':
         """The variables can be accessed like this :
@@ -43,9 +73,11 @@ class Variable:
         Returns:
             Variable: The searched variable, or a newly created variable (always non-initialized, which means no value is provided).
         """
-        if name not in cls.VARIABLES.keys():
+        # A single lookup, __new__() is only reached for a new name
+        variable = cls.VARIABLES.get(name)
+        if variable is None:
             return cls(name)
-        return cls.VARIABLES[name]
+        return variable
 
     def __repr__(self) -> str:
         return '<Variable({}={})>'.format(self.name, self.value)
@@ -59,17 +91,45 @@ class Variable:
         Returns:
             int: The value. Raises an exception if not initialized.
         """
-        if not self.value:
+        # 0 is a value as well
+        if self._value is None:
             raise ValueError("The variable {} has not been initialized.".format(self))
         return int(self.value)
 
+    def snapshot(self) -> 'Variable':
+        """Copy the variable with its current value and history.
+
+        NOTE: Unlike a newly created variable, the copy is not kept track of in VARIABLES.
+
+        Returns:
+            Variable: The copy.
+        """
+        # Bypass __new__(), which would return this very variable
+        variable = object.__new__(self.__class__)
+        variable.name = self.name
+        variable.history = list(self.history)
+        variable._value = self._value
+        variable.bit = self.bit
+        return variable
+
     def reset(self):
         """Un-set its value and empty the history.
 
         NOTE: It should be used only in the System() class.
         """
         self.value = None
-        self.history = []
+        self.history = self.__class__.new_history()
+
+    @classmethod
+    def new_history(cls) -> Union[List[Optional[int]], Deque[Optional[int]]]:
+        """Create an empty history, bounded by HISTORY_LIMIT if any.
+
+        Returns:
+            Union[List[Optional[int]], Deque[Optional[int]]]: A list, or a deque discarding the oldest values beyond the limit.
+        """
+        if cls.HISTORY_LIMIT is None:
+            return []
+        return collections.deque(maxlen=cls.HISTORY_LIMIT)
 
     @property
     def value(self) -> Optional[int]:
@@ -78,7 +138,8 @@ class Variable:
     @value.setter
     def value(self, value:int):
         """Each time a value is affected to the variable,
-        the previous one is stored in the history.
+        the previous one is stored in the history, unless RECORD_HISTORY is disabled.
         """
         self._value = value
-        self.history.append(value)
\ No newline at end of file
+        if self.__class__.RECORD_HISTORY:
+            self.history.append(value)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import pytest
+
+from systeme.instruction import Sleep
+from systeme.task import Task
+from systeme.variable import Variable
+
+@pytest.fixture(autouse=True)
+def reset():
+    """Each test starts without any task nor variable, and sleeps in virtual time."""
+    Task.reset()
+    Task.ID = 1
+    Variable.VARIABLES.clear()
+    Sleep.virtual = True
+    yield
+    Sleep.virtual = False
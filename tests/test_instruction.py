@@ -0,0 +1,136 @@
+from operator import add, sub, mul, floordiv
+
+import pytest
+
+from systeme.instruction import Constant, Read, Assign, Sleep, Add, Sub, Mul, Div, SourceGenerator, convert_to_instruction, convert_to_variable
+from systeme.task import Task
+from systeme.variable import Variable
+
+OPERATORS = [Add, Sub, Mul, Div]
+OPERANDS = [(7, 3), (-7, 3), (7, -3), (0, 5), (2 ** 40, 2 ** 40)]
+
+def emit(instruction):
+    """Execute an instruction through the function generated from its source code."""
+    generator = SourceGenerator()
+    generator.evaluate(instruction.emit_source(generator))
+    function = generator.build()
+    values = function(*[int(variable) for variable in generator.inputs])
+    for variable, value in zip(generator.writes, values):
+        variable.value = value
+
+@pytest.mark.parametrize('operator', OPERATORS)
+@pytest.mark.parametrize('a, b', OPERANDS)
+def test_execution_modes_agree(operator, a, b):
+    Variable['a'].value = a
+    Variable['b'].value = b
+    expected = operator('a', 'b').execute()
+
+    assert operator('a', 'b').compile()() == expected
+
+    emit(operator('a', 'b', 'r'))
+    assert Variable['r'].value == expected
+
+    # Folded while generating
+    emit(operator(a, b, 'f'))
+    assert Variable['f'].value == expected
+
+@pytest.mark.parametrize('operator', OPERATORS)
+@pytest.mark.parametrize('a, b', OPERANDS)
+def test_task_kernel_agrees_with_closures(operator, a, b):
+    task = Task([operator('a', 'b', 'r'), operator('r', 'b', 's')])
+
+    Variable['a'].value = a
+    Variable['b'].value = b
+    for execute in task.compile():
+        execute()
+    expected = (Variable['r'].value, Variable['s'].value)
+
+    Variable['a'].value = a
+    Variable['b'].value = b
+    task.execute(verbose=False)
+    assert (Variable['r'].value, Variable['s'].value) == expected
+
+@pytest.mark.parametrize('instructions', [
+    lambda: [Assign('a', 5), Div('a', 0, 'b')],
+    lambda: [Assign('a', 5), Add('a', 'u', 'b')],
+])
+def test_failed_task_leaves_the_same_state_in_every_mode(instructions):
+    states = []
+    for verbose in (False, True):
+        Task.reset()
+        for variable in (Variable['a'], Variable['b'], Variable['u']):
+            variable.reset()
+        task = Task(instructions())
+        with pytest.raises((ZeroDivisionError, ValueError)):
+            task.execute(verbose=verbose)
+        states.append([(variable.value, list(variable.history)) for variable in (Variable['a'], Variable['b'])])
+
+    assert states[0] == states[1] == [(5, [5]), (None, [])]
+
+def test_division_by_zero_raises_in_every_mode():
+    Variable['x'].value = 1
+    with pytest.raises(ZeroDivisionError):
+        Div('x', 0).execute()
+    with pytest.raises(ZeroDivisionError):
+        Div('x', 0).compile()()
+    with pytest.raises(ZeroDivisionError):
+        emit(Div('x', 0))
+    with pytest.raises(ZeroDivisionError):
+        Task([Div('x', 0)]).execute(verbose=False)
+
+OPERATIONS = [
+    (Add, add, '+'),
+    (Sub, sub, '-'),
+    (Mul, mul, '*'),
+    (Div, floordiv, '/'),
+]
+
+@pytest.mark.parametrize('cls, operation, symbol', OPERATIONS)
+@pytest.mark.parametrize('a, b', [(7, 3), (-7, 3), (7, -3), (0, 5)])
+def test_operator(cls, operation, symbol, a, b):
+    Variable['a'].value = a
+    Variable['b'].value = b
+
+    assert cls('a', 'b').execute() == operation(a, b)
+    assert cls('a', 'b').compile()() == operation(a, b)
+
+    cls('a', 'b', 'r').execute()
+    assert Variable['r'].value == operation(a, b)
+    cls('a', 'b', 'c').compile()()
+    assert Variable['c'].value == operation(a, b)
+
+    assert str(cls('a', 'b', 'r')) == 'r = a {} b'.format(symbol)
+
+@pytest.mark.parametrize('create, expected', [
+    (lambda: Constant(4), 4),
+    (lambda: Read(Variable['a']), 7),
+    (lambda: Sleep(1), None),
+])
+def test_instruction(create, expected):
+    Variable['a'].value = 7
+    assert create().execute() == expected
+    assert create().compile()() == expected
+
+@pytest.mark.parametrize('create', [lambda: 4, lambda: 'a', lambda: Variable['a'], lambda: Add('a', 1)])
+def test_assign(create):
+    Variable['a'].value = 7
+    value = create()
+    expected = convert_to_instruction(value).execute()
+
+    Assign('x', value).execute()
+    assert Variable['x'].value == expected
+    Assign('y', value).compile()()
+    assert Variable['y'].value == expected
+
+def test_assign_refuses_sleep():
+    with pytest.raises(ValueError):
+        Assign('x', Sleep(1))
+
+def test_conversions():
+    assert isinstance(convert_to_instruction(Variable['a']), Read)
+    assert convert_to_instruction(Variable['a']).variable is Variable['a']
+    assert isinstance(convert_to_instruction(3), Constant)
+    assert convert_to_variable('a') is Variable['a']
+    assert convert_to_variable(None) is None
+    with pytest.raises(ValueError):
+        convert_to_variable(3)
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from systeme.instruction import Instruction, Assign, Constant, Add, Mul, Div, Sleep
+from systeme.system import System, Sequential, Parallelize
+from systeme.task import Task
+from systeme.variable import Variable
+
+def create_tasks():
+    t1 = Task([Assign('x', 30), Sleep(1)])
+    t2 = Task([Assign('y', 10), Sleep(1)], dependencies=t1)
+    t3 = Task([Assign('z', 10), Sleep(1)], dependencies=[t1])
+    t4 = Task([Add(10, 40, 'z'), Sleep(1)], dependencies=[t2, t3])
+    t5 = Task([Assign('o', 100), Sleep(1)], dependencies=[t3])
+    t6 = Task([Mul('o', 'x', 'o')], dependencies=[t4, t5])
+    return [t1, t2, t3, t4, t5, t6]
+
+def arcs(system):
+    return {task.name: sorted(dependency.name for dependency in task.dependencies) for task in system.tasks}
+
+@pytest.mark.parametrize('verbose', [False, True])
+def test_derived_systems_are_equivalent(verbose):
+    with System(tasks=create_tasks()) as system, Parallelize(system) as parallel, Sequential(system) as sequential:
+        system.run(loops=2, verbose=verbose)
+        parallel.run(loops=2, verbose=verbose)
+        sequential.run(loops=2, verbose=verbose)
+
+        assert system.is_equivalent(parallel)
+        assert system.is_equivalent(sequential)
+        assert parallel.is_equivalent(sequential)
+        assert system.history['o'].value == 3000
+
+def test_parallelize_keeps_only_conflicting_arcs():
+    with System(tasks=create_tasks()) as system, Parallelize(system) as parallel:
+        # t3 and t4 both write z, t6 reads x written by t1 and writes o like t5
+        assert arcs(parallel) == {1: [], 2: [], 3: [], 4: [3], 5: [], 6: [1, 5]}
+
+def test_sequential_is_a_chain():
+    with System(tasks=create_tasks()) as system, Sequential(system) as sequential:
+        assert arcs(sequential) == {1: [], 2: [1], 3: [2], 4: [3], 5: [4], 6: [5]}
+
+def test_parallelized_histories_are_equal():
+    with System(tasks=create_tasks()) as system, Parallelize(system) as parallel:
+        parallel.run(loops=5, verbose=False)
+        assert parallel.are_histories_equal()
+
+def test_failed_run_waits_for_running_tasks():
+    # t2 sleeps then writes y, while t1 fails right away
+    t1 = Task([Div(1, 0)])
+    t2 = Task([Sleep(0.2), Assign('y', 1)])
+    Sleep.virtual = False
+    with System(tasks=[t1, t2]) as system:
+        with pytest.raises(ZeroDivisionError):
+            system.run(verbose=False)
+        assert Variable['y'].value == 1
+
+def test_randomized_instructions_are_refreshed():
+    task = Task([Assign('x', Add(Add(1, 2), 'y')), Sleep(1)])
+    with System(tasks=[task]) as system:
+        system.randomize_variables(rng=random.Random(0))
+        a, b = task.instructions[0].instruction.i1.i1.value, task.instructions[0].instruction.i1.i2.value
+        assert str(task.instructions[0]) == str(Assign('x', Add(Add(a, b), 'y')))
+
+def test_randomize_is_reproducible():
+    outputs = []
+    for _ in range(2):
+        Task.reset()
+        Task.ID = 1
+        with System(tasks=create_tasks()) as system:
+            system.randomize_variables(rng=random.Random(3))
+            outputs.append([str(instruction) for task in system.tasks for instruction in task.instructions])
+    assert outputs[0] == outputs[1]
+
+class Opaque(Constant):
+    """A constant without any source code, see Instruction.emit_source()."""
+    __slots__ = ()
+    emit_source = Instruction.emit_source
+
+def test_sequential_without_source_code_executes_the_tasks():
+    t1 = Task([Assign('x', Opaque(4))])
+    t2 = Task([Add('x', 1, 'y')], dependencies=t1)
+    with System(tasks=[t1, t2]) as system, Sequential(system) as sequential:
+        system.run(verbose=False)
+        sequential.run(verbose=False)
+        assert system.is_equivalent(sequential)
+        assert sequential.history['y'].value == 5
+
+def test_cyclic_system_is_refused():
+    t1 = Task([Assign('x', 1)])
+    t2 = Task([Assign('y', 1)], dependencies=t1)
+    t1.dependencies = [t2]
+    with pytest.raises(RuntimeError):
+        System(tasks=[t1, t2])
+
+def test_dependency_out_of_system_is_refused():
+    t1 = Task([Assign('x', 1)])
+    t2 = Task([Assign('y', 1)], dependencies=t1)
+    with pytest.raises(ValueError, match='Task\\(1\\)'):
+        System(tasks=[t2])
+
+def test_disconnected_final_tasks():
+    t1 = Task([Assign('x', 1)])
+    t2 = Task([Assign('y', 1)], dependencies=t1)
+    t3 = Task([Assign('z', 1)])
+    with System(tasks=[t1, t2, t3]) as system:
+        assert sorted(sorted(task.name for task in group) for group in system.disconnected_final_tasks()) == [[2], [3]]
+
+        t3.dependencies = [Task([Assign('w', 1)])]
+        with pytest.raises(ValueError):
+            system.disconnected_final_tasks()
+
+def test_interfering_system_is_refused():
+    t1 = Task([Assign('x', 1)])
+    t2 = Task([Assign('x', 2)])
+    with pytest.raises(RuntimeError):
+        System(tasks=[t1, t2])
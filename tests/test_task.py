@@ -0,0 +1,60 @@
+import pytest
+
+import systeme.task
+from systeme.instruction import Assign, Add, Mul
+from systeme.task import Task
+from systeme.variable import Variable
+
+def test_duplicated_task_is_refused_before_compiling():
+    Task([Assign('x', 1)], name='t')
+    kernels = len(systeme.task._KERNELS)
+    with pytest.raises(ValueError):
+        Task([Assign('x', 123456789)], name='t')
+    assert len(systeme.task._KERNELS) == kernels
+
+def test_kernels_are_bounded(monkeypatch):
+    monkeypatch.setattr(systeme.task, '_KERNELS_LIMIT', 3)
+    systeme.task._KERNELS.clear()
+    tasks = [Task([Add('x', i, 'y')]) for i in range(5)]
+    assert len(systeme.task._KERNELS) == 3
+
+    # The evicted functions are still held by their tasks
+    Variable['x'].value = 10
+    for i, task in enumerate(tasks):
+        task.execute(verbose=False)
+        assert Variable['y'].value == 10 + i
+
+@pytest.mark.parametrize('instructions, inputs', [
+    # Within int64
+    (lambda: [Mul('x', 3, 'y'), Add('y', 'x', 'z')], {'x': 7}),
+    # A product of two inputs beyond int64 once squared again
+    (lambda: [Mul('x', 'x', 'y'), Mul('y', 'y', 'z')], {'x': 2 ** 20}),
+    # A folded literal beyond int64
+    (lambda: [Mul(2 ** 40, 2 ** 40, 'y'), Add('y', 'x', 'z')], {'x': 1}),
+    # An input beyond the bound of the inputs
+    (lambda: [Mul('x', 2, 'y'), Add('y', 'x', 'z')], {'x': 2 ** 63}),
+])
+def test_numba_kernel_agrees_with_closures(instructions, inputs):
+    pytest.importorskip('numba')
+    systeme.task._KERNELS.clear()
+
+    results = []
+    for verbose in (False, True):
+        Task.reset()
+        for name, value in inputs.items():
+            Variable[name].value = value
+        task = Task(instructions())
+        task.execute(verbose=verbose)
+        results.append((Variable['y'].value, Variable['z'].value))
+    assert results[0] == results[1]
+
+def test_numba_compiles_bounded_kernels():
+    pytest.importorskip('numba')
+    systeme.task._KERNELS.clear()
+
+    Task([Mul('x', 3, 'y')], name='bounded')
+    Task([Mul('x', 'x', 'y'), Mul('y', 'y', 'z')], name='unbounded')
+    kernels = list(systeme.task._KERNELS.values())
+    # The plain Python function is kept along the compiled one
+    assert kernels[0][0] is not kernels[0][1]
+    assert kernels[1][0] is kernels[1][1]
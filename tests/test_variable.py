@@ -0,0 +1,25 @@
+import copy
+
+from systeme.variable import Variable
+
+def test_variable_is_unique_by_name():
+    x = Variable('x', 1)
+    assert Variable['x'] is x
+    assert Variable('x') is x and x.value == 1
+    assert Variable('x', 2) is x and x.value == 2
+
+def test_copies_are_the_variable_itself():
+    x = Variable['x']
+    x.value = 1
+    history = x.history
+    for copied in (copy.copy(x), copy.deepcopy(x), copy.deepcopy([x])[0]):
+        assert copied is x
+        assert x.history is history and x.history == [1]
+
+def test_snapshot_is_independent():
+    x = Variable['x']
+    x.value = 1
+    snapshot = x.snapshot()
+    x.value = 2
+    assert snapshot is not x
+    assert (snapshot.value, snapshot.history) == (1, [1])